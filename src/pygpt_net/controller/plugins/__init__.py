@@ -9,6 +9,7 @@
 # Updated Date: 2024.11.21 20:00:00                  #
 # ================================================== #
 
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QAction
 
 from pygpt_net.core.types import (
@@ -31,11 +32,26 @@ class Plugins:
         self.window = window
         self.settings = Settings(window)
         self.presets = Presets(window)
-        self.enabled = {}
+        self.enabled = set()  # ids of enabled plugins
+        self.tab_index = None  # cached plugin tab indexes, by plugin id
+        self.types = {}  # cached plugin types, by plugin id
+        self.names = {}  # cached plugin names, by plugin id
+        self.audio_ids = set()  # cached ids of audio input/output plugins
+        self.enabled_by_type = {}  # number of enabled plugins, by plugin type
+        self.ui_ready = set()  # ids of plugins with UI already set up
+        self.bulk = False  # bulk mode, skip UI refresh on every enable/disable
+        self.bulk_audio = False  # audio update requested in bulk mode
+        self.type_handlers = {
+            'audio.input': self.handle_audio_input,
+            'audio.output': self.handle_audio_output,
+            'schedule': self.handle_schedule,
+        }  # UI handlers, by plugin type
 
     def setup(self):
         """Set up plugins"""
+        self.tab_index = None  # rebuild tab indexes
         self.setup_menu()
+        self.setup_cache()
         self.setup_ui()
 
         try:
@@ -57,32 +73,63 @@ class Plugins:
         self.presets.update_menu()
 
     def setup_ui(self):
-        """Set up plugins UI"""
-        for id in self.window.core.plugins.get_ids():
-            try:
-                # setup UI
-                self.window.core.plugins.get(id).setup_ui()
-            except AttributeError:
-                pass
-
+        """Set up plugins UI (plugin UI is set up on first use)"""
         # show/hide UI elements
         self.handle_types()
 
         # tmp dump locales
         # self.window.core.plugins.dump_locales()
 
+    def setup_plugin_ui(self, id: str):
+        """
+        Set up plugin UI if not set up yet
+
+        :param id: plugin id
+        """
+        if id in self.ui_ready:
+            return
+        try:
+            self.window.core.plugins.get(id).setup_ui()
+        except AttributeError:
+            pass
+        self.ui_ready.add(id)
+
     def setup_menu(self):
         """Set up plugins menu"""
-        for id in self.window.core.plugins.get_ids():
-            if id in self.window.ui.menu['plugins']:
+        plugins = self.window.core.plugins
+        actions = self.window.ui.menu['plugins']
+        new_actions = []
+        for id in self.get_ids():
+            if id in actions:
                 continue
-            name = self.window.core.plugins.get_name(id)
-            tooltip = self.window.core.plugins.get_desc(id)
-            self.window.ui.menu['plugins'][id] = QAction(name, self.window, checkable=True)
-            self.window.ui.menu['plugins'][id].triggered.connect(
+            name = plugins.get_name(id)
+            tooltip = plugins.get_desc(id)
+            actions[id] = QAction(name, self.window, checkable=True)
+            actions[id].triggered.connect(
                 lambda checked=None, id=id: self.toggle(id))
-            self.window.ui.menu['plugins'][id].setToolTip(tooltip)
-            self.window.ui.menu['menu.plugins'].addAction(self.window.ui.menu['plugins'][id])
+            actions[id].setToolTip(tooltip)
+            new_actions.append(actions[id])
+
+        # add all new actions at once
+        if new_actions:
+            self.window.ui.menu['menu.plugins'].addActions(new_actions)
+
+    def setup_cache(self):
+        """Set up plugins metadata cache"""
+        get = self.window.core.plugins.get
+        self.types = {}
+        self.names = {}
+        for id in self.get_ids():
+            plugin = get(id)
+            self.types[id] = frozenset(plugin.type)
+            self.names[id] = plugin.name
+        self.audio_ids = {
+            id for id, types in self.types.items()
+            if 'audio.input' in types or 'audio.output' in types
+        }
+        self.enabled_by_type = {}
+        for id in self.enabled:
+            self.count_types(id, 1)
 
     def setup_config(self, silent: bool = False):
         """
@@ -90,23 +137,35 @@ class Plugins:
 
         :param silent: silent mode
         """
-        for id in self.window.core.plugins.get_ids():
-            if id in self.window.core.config.get('plugins_enabled'):
-                if self.window.core.config.data['plugins_enabled'][id]:
+        plugins_enabled = self.window.core.config.get('plugins_enabled')
+        prev_enabled = dict(plugins_enabled)
+        self.bulk = True
+        self.bulk_audio = False
+        try:
+            for id in self.get_ids():
+                if id in plugins_enabled and plugins_enabled[id]:
                     self.enable(id)
                 else:
                     self.disable(id, silent=silent)
-            else:
-                self.disable(id, silent=silent)
+        finally:
+            self.bulk = False
+
+        # save config once, only if changed
+        if plugins_enabled != prev_enabled:
+            self.window.core.config.save()
+
+        # refresh UI once, menu is refreshed in reconfigure()
+        if self.bulk_audio:
+            self.bulk_audio = False
+            self.window.controller.audio.update()
+        self.update_info()
 
     def update(self):
         """Update plugins menu"""
-        for id in self.window.ui.menu['plugins']:
-            self.window.ui.menu['plugins'][id].setChecked(False)
-
-        for id in self.enabled:
-            if self.enabled[id]:
-                self.window.ui.menu['plugins'][id].setChecked(True)
+        for id, action in self.window.ui.menu['plugins'].items():
+            checked = id in self.enabled
+            if action.isChecked() != checked:  # update only changed
+                action.setChecked(checked)
 
         self.handle_types()
         self.window.controller.ui.mode.update()  # refresh active elements
@@ -119,21 +178,11 @@ class Plugins:
         :param id: plugin id
         """
         if self.window.core.plugins.is_registered(id):
-            self.enabled[id] = True
-            self.window.core.plugins.enable(id)
+            self.handle_enable(id)
 
-            # dispatch plugin enable event
-            event = Event(Event.ENABLE, {
-                'value': id,
-            })
-            self.window.dispatch(event)
-
-            # update audio menu
-            if self.has_type(id, 'audio.input') or self.has_type(id, 'audio.output'):
-                self.window.controller.audio.update()
-
-        self.update_info()
-        self.update()
+        if not self.bulk:
+            self.update_info()
+            self.update()
 
     def disable(self, id: str, silent: bool = False):
         """
@@ -143,35 +192,102 @@ class Plugins:
         :param silent: silent mode
         """
         if self.window.core.plugins.is_registered(id):
-            self.enabled[id] = False
-            self.window.core.plugins.disable(id)
+            self.handle_disable(id, silent=silent)
+
+        if not self.bulk:
+            self.update_info()
+            self.update()
 
-            if not silent:
-                # dispatch plugin disable event
-                event = Event(Event.DISABLE, {
-                    'value': id,
-                })
-                self.window.dispatch(event, all=True)  # dispatch to all plugins, including disabled now
+    def handle_enable(self, id: str, defer: bool = False):
+        """
+        Handle plugin enable (plugin must be registered)
 
-                # update audio menu
-                if self.has_type(id, 'audio.input') or self.has_type(id, 'audio.output'):
-                    self.window.controller.audio.update()
+        :param id: plugin id
+        :param defer: defer event dispatch to the next event loop iteration
+        """
+        self.setup_plugin_ui(id)
+        if id not in self.enabled:
+            self.enabled.add(id)
+            self.count_types(id, 1)
+        self.window.core.plugins.enable(id, save=not self.bulk)
 
-        self.update_info()
-        self.update()
+        if defer:
+            QTimer.singleShot(0, lambda: self.post_enable(id))
+        else:
+            self.post_enable(id)
 
-    def is_enabled(self, id: str):
+    def handle_disable(self, id: str, silent: bool = False, defer: bool = False):
+        """
+        Handle plugin disable (plugin must be registered)
+
+        :param id: plugin id
+        :param silent: silent mode
+        :param defer: defer event dispatch to the next event loop iteration
+        """
+        if id in self.enabled:
+            self.enabled.discard(id)
+            self.count_types(id, -1)
+        self.window.core.plugins.disable(id, save=not self.bulk)
+
+        if not silent:
+            if defer:
+                QTimer.singleShot(0, lambda: self.post_disable(id))
+            else:
+                self.post_disable(id)
+
+    def post_enable(self, id: str):
+        """
+        Dispatch plugin enable event and update audio menu
+
+        :param id: plugin id
+        """
+        if id not in self.enabled:
+            return  # disabled again before deferred call
+
+        # dispatch plugin enable event
+        event = Event(Event.ENABLE, {
+            'value': id,
+        })
+        self.window.dispatch(event)
+
+        # update audio menu
+        if id in self.audio_ids:
+            self.update_audio()
+
+    def post_disable(self, id: str):
+        """
+        Dispatch plugin disable event and update audio menu
+
+        :param id: plugin id
+        """
+        if id in self.enabled:
+            return  # enabled again before deferred call
+
+        # dispatch plugin disable event
+        event = Event(Event.DISABLE, {
+            'value': id,
+        })
+        self.window.dispatch(event, all=True)  # dispatch to all plugins, including disabled now
+
+        # update audio menu
+        if id in self.audio_ids:
+            self.update_audio()
+
+    def update_audio(self):
+        """Update audio menu, deferred until the end of bulk mode"""
+        if self.bulk:
+            self.bulk_audio = True
+            return
+        self.window.controller.audio.update()
+
+    def is_enabled(self, id: str) -> bool:
         """
         Check if plugin is enabled
 
         :param id: plugin id
         :return: True if enabled
-        :rtype: bool
         """
-        if self.window.core.plugins.is_registered(id):
-            if id in self.enabled:
-                return self.enabled[id]
-        return False
+        return id in self.enabled  # only registered plugins are stored here
 
     def toggle(self, id: str):
         """
@@ -180,10 +296,13 @@ class Plugins:
         :param id: plugin id
         """
         if self.window.core.plugins.is_registered(id):
-            if self.is_enabled(id):
-                self.disable(id)
+            # plugin events are dispatched after return to the event loop
+            if id in self.enabled:
+                self.handle_disable(id, defer=True)
             else:
-                self.enable(id)
+                self.handle_enable(id, defer=True)
+            self.update_info()
+            self.update()
 
         self.handle_types()
         self.window.controller.ui.update_tokens()  # refresh tokens
@@ -198,13 +317,12 @@ class Plugins:
 
         :param idx: tab index
         """
-        plugin_idx = 0
-        for id in self.window.core.plugins.get_ids():
+        ids = self.get_ids()
+        if 0 <= idx < len(ids):
+            id = ids[idx]
             if self.window.core.plugins.has_options(id):
-                if plugin_idx == idx:
-                    self.settings.current_plugin = id
-                    break
-            plugin_idx += 1
+                self.setup_plugin_ui(id)
+                self.settings.current_plugin = id
         current = self.window.ui.models['plugin.list'].index(idx, 0)
         self.window.ui.nodes['plugin.list'].setCurrentIndex(current)
 
@@ -215,14 +333,9 @@ class Plugins:
         :param plugin_id: plugin id
         :return: tab index
         """
-        plugin_idx = None
-        i = 0
-        for id in self.window.core.plugins.get_ids():
-            if id == plugin_id:
-                plugin_idx = i
-                break
-            i += 1
-        return plugin_idx
+        if self.tab_index is None:
+            self.tab_index = {id: i for i, id in enumerate(self.get_ids())}
+        return self.tab_index.get(plugin_id)
 
     def unregister(self, id: str):
         """
@@ -232,7 +345,13 @@ class Plugins:
         """
         self.window.core.plugins.unregister(id)
         if id in self.enabled:
-            self.enabled.pop(id)
+            self.enabled.discard(id)
+            self.count_types(id, -1)
+        self.types.pop(id, None)
+        self.names.pop(id, None)
+        self.audio_ids.discard(id)
+        self.ui_ready.discard(id)
+        self.tab_index = None
 
     def destroy(self):
         """Destroy plugins workers"""
@@ -241,7 +360,7 @@ class Plugins:
         event = Event(Event.FORCE_STOP, {})
         self.window.dispatch(event)
 
-        for id in self.window.core.plugins.get_ids():
+        for id in self.get_ids():
             try:
                 # destroy plugin workers
                 self.window.core.plugins.destroy(id)
@@ -255,10 +374,7 @@ class Plugins:
         :param type: type to check
         :return: True if has type
         """
-        if self.window.core.plugins.is_registered(id):
-            if type in self.window.core.plugins.get(id).type:
-                return True
-        return False
+        return type in self.types.get(id, ())
 
     def is_type_enabled(self, type: str) -> bool:
         """
@@ -267,102 +383,130 @@ class Plugins:
         :param type: plugin type
         :return: True if enabled
         """
-        enabled = False
-        for id in self.window.core.plugins.get_ids():
-            if type in self.window.core.plugins.get(id).type and self.is_enabled(id):
-                enabled = True
-                break
-        return enabled
+        return self.enabled_by_type.get(type, 0) > 0
+
+    def count_types(self, id: str, diff: int):
+        """
+        Update enabled plugins count by plugin type
+
+        :param id: plugin id
+        :param diff: count difference (1 on enable, -1 on disable)
+        """
+        for type in self.types.get(id, ()):
+            self.enabled_by_type[type] = self.enabled_by_type.get(type, 0) + diff
 
     def handle_types(self):
         """Handle plugin type"""
         for type in self.window.core.plugins.allowed_types:
+            if type in self.type_handlers:
+                self.type_handlers[type](self.is_type_enabled(type))
+
+    def handle_audio_input(self, enabled: bool):
+        """
+        Handle audio input plugin type
+
+        :param enabled: True if audio input type is enabled
+        """
+        if not enabled:
+            self.set_visible('audio.input.btn', False)  # simple recording
+            self.set_visible('audio.input', False)  # advanced recording
+            self.window.controller.audio.toggle_input_icon(False)
+            return
 
-            # get advanced audio input option
-            is_advanced = False
+        # get advanced audio input option
+        is_advanced = False
+        data = {
+            'name': 'audio.input.advanced',
+            'value': is_advanced,
+        }
+        event = Event(Event.PLUGIN_OPTION_GET, data)
+        self.window.dispatch(event)
+        if 'value' in event.data:
+            is_advanced = event.data['value']
+
+        self.set_visible('audio.input.btn', not is_advanced)  # simple recording
+        self.set_visible('audio.input', is_advanced)  # advanced recording
+        self.window.controller.audio.toggle_input_icon(True)
+
+    def handle_audio_output(self, enabled: bool):
+        """
+        Handle audio output plugin type
+
+        :param enabled: True if audio output type is enabled
+        """
+        if enabled:
+            self.window.controller.audio.toggle_output_icon(True)
+            # self.window.ui.plugin_addon['audio.output'].setVisible(True)
+        else:
+            self.set_visible('audio.output', False)
+            self.window.controller.audio.toggle_output_icon(False)
+
+    def handle_schedule(self, enabled: bool):
+        """
+        Handle schedule plugin type
+
+        :param enabled: True if schedule type is enabled
+        """
+        if enabled:
+            self.set_visible('schedule', True)
+            # get tasks count by throwing "get option" event
+            num = 0
             data = {
-                'name': 'audio.input.advanced',
-                'value': is_advanced,
+                'name': 'scheduled_tasks_count',
+                'value': num,
             }
             event = Event(Event.PLUGIN_OPTION_GET, data)
             self.window.dispatch(event)
             if 'value' in event.data:
-                is_advanced = event.data['value']
-
-            if type == 'audio.input':
-                if self.is_type_enabled(type):
-                    if is_advanced:
-                        self.window.ui.plugin_addon['audio.input.btn'].setVisible(False)
-                        self.window.ui.plugin_addon['audio.input'].setVisible(True)
-                    else:
-                        self.window.ui.plugin_addon['audio.input.btn'].setVisible(True)  # simple recording
-                        self.window.ui.plugin_addon['audio.input'].setVisible(False)  # advanced recording
-                    self.window.controller.audio.toggle_input_icon(True)
-                else:
-                    self.window.ui.plugin_addon['audio.input.btn'].setVisible(False)  # simple recording
-                    self.window.ui.plugin_addon['audio.input'].setVisible(False)  # advanced recording
-                    self.window.controller.audio.toggle_input_icon(False)
-
-            elif type == 'audio.output':
-                if self.is_type_enabled(type):
-                    self.window.controller.audio.toggle_output_icon(True)
-                    # self.window.ui.plugin_addon['audio.output'].setVisible(True)
-                else:
-                    self.window.ui.plugin_addon['audio.output'].setVisible(False)
-                    self.window.controller.audio.toggle_output_icon(False)
-
-            elif type == 'schedule':
-                if self.is_type_enabled(type):
-                    self.window.ui.plugin_addon['schedule'].setVisible(True)
-                    # get tasks count by throwing "get option" event
-                    num = 0
-                    data = {
-                        'name': 'scheduled_tasks_count',
-                        'value': num,
-                    }
-                    event = Event(Event.PLUGIN_OPTION_GET, data)
-                    self.window.dispatch(event)
-                    if 'value' in event.data:
-                        num = event.data['value']
-                    # update tray menu
-                    self.window.ui.tray.update_schedule_tasks(num)
-                else:
-                    self.window.ui.plugin_addon['schedule'].setVisible(False)
-                    self.window.ui.tray.hide_schedule_menu()
+                num = event.data['value']
+            # update tray menu
+            self.window.ui.tray.update_schedule_tasks(num)
+        else:
+            self.set_visible('schedule', False)
+            self.window.ui.tray.hide_schedule_menu()
+
+    def set_visible(self, key: str, visible: bool):
+        """
+        Set plugin UI addon visibility (only if changed)
+
+        :param key: addon key
+        :param visible: True to show
+        """
+        addon = self.window.ui.plugin_addon[key]
+        if addon.testAttribute(Qt.WA_WState_ExplicitShowHide) and addon.isHidden() != visible:
+            return  # already in requested state
+        addon.setVisible(visible)
 
     def on_update(self):
         """Called on update"""
-        for id in self.window.core.plugins.get_ids():
+        get = self.window.core.plugins.get
+        for id in self.get_ids():
             if self.is_enabled(id):
                 try:
-                    self.window.core.plugins.get(id).on_update()
+                    get(id).on_update()
                 except AttributeError:
                     pass
 
     def on_post_update(self):
         """Called on post update"""
-        for id in self.window.core.plugins.get_ids():
+        get = self.window.core.plugins.get
+        for id in self.get_ids():
             if self.is_enabled(id):
                 try:
-                    self.window.core.plugins.get(id).on_post_update()
+                    get(id).on_post_update()
                 except AttributeError:
                     pass
 
     def update_info(self):
         """Update plugins info"""
         enabled_list = []
-        for id in self.window.core.plugins.get_ids():
+        for id in self.get_ids():
             if self.is_enabled(id):
-                enabled_list.append(self.window.core.plugins.get(id).name)
+                enabled_list.append(self.names[id])
         tooltip = " + ".join(enabled_list)
 
         count_str = ""
-        c = 0
-        if len(self.window.core.plugins.get_ids()) > 0:
-            for id in self.window.core.plugins.get_ids():
-                if self.is_enabled(id):
-                    c += 1
-
+        c = len(enabled_list)
         if c > 0:
             count_str = "+ " + str(c) + " " + trans('chatbox.plugins')
         self.window.ui.nodes['chat.plugins'].setText(count_str)
@@ -389,7 +533,7 @@ class Plugins:
         :param cmds: commands list
         """
         commands = self.window.core.command.from_commands(cmds)
-        if len(commands) == 0:
+        if not commands:
             return
 
         # dispatch command execute event
@@ -426,7 +570,7 @@ class Plugins:
         :param cmds: commands list
         """
         commands = self.window.core.command.from_commands(cmds)
-        if len(commands) == 0:
+        if not commands:
             return
 
         # dispatch inline command event
@@ -455,6 +599,14 @@ class Plugins:
 
         return ctx.results
 
+    def get_ids(self) -> tuple:
+        """
+        Get plugins ids (cached in plugins core)
+
+        :return: plugins ids tuple
+        """
+        return self.window.core.plugins.get_ids()
+
     def reload(self):
         """Reload plugins"""
         self.window.core.plugins.reload_all()  # reload all plugin options
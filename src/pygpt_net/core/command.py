@@ -177,11 +177,7 @@ class Command:
         :param cmds: commands list
         :return parsed commands
         """
-        commands = []
-        for cmd in cmds:
-            if 'cmd' in cmd:
-                commands.append(cmd)
-        return commands
+        return [cmd for cmd in cmds if 'cmd' in cmd]
 
     def unpack_tool_calls(self, tool_calls: list) -> list:
         """
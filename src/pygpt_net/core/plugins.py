@@ -36,6 +36,7 @@ class Plugins:
             'schedule'
         ]
         self.plugins = {}
+        self.ids = None  # cached plugins ids
         self.presets = {}  # presets config
         self.provider = JsonFileProvider(window)
 
@@ -56,13 +57,15 @@ class Plugins:
         """
         return self.plugins
 
-    def get_ids(self) -> list:
+    def get_ids(self) -> tuple:
         """
-        Get all plugins ids
+        Get all plugins ids (cached until register/unregister)
 
-        :return: plugins ids list
+        :return: plugins ids tuple
         """
-        return list(self.plugins.keys())
+        if self.ids is None:
+            self.ids = tuple(self.plugins.keys())
+        return self.ids
 
     def get(self, id: str) -> BasePlugin or None:
         """
@@ -97,6 +100,7 @@ class Plugins:
         plugin.attach(self.window)
         id = plugin.id
         self.plugins[id] = plugin
+        self.ids = None  # invalidate ids cache
 
         # make copy of options
         if hasattr(plugin, 'options'):
@@ -168,28 +172,33 @@ class Plugins:
         """
         if self.is_registered(id):
             self.plugins.pop(id)
+            self.ids = None  # invalidate ids cache
 
-    def enable(self, id: str):
+    def enable(self, id: str, save: bool = True):
         """
         Enable plugin
 
         :param id: plugin id
+        :param save: save config
         """
         if self.is_registered(id):
             self.plugins[id].enabled = True
             self.window.core.config.data['plugins_enabled'][id] = True
-            self.window.core.config.save()
+            if save:
+                self.window.core.config.save()
 
-    def disable(self, id: str):
+    def disable(self, id: str, save: bool = True):
         """
         Disable plugin
 
         :param id: plugin id
+        :param save: save config
         """
         if self.is_registered(id):
             self.plugins[id].enabled = False
             self.window.core.config.data['plugins_enabled'][id] = False
-            self.window.core.config.save()
+            if save:
+                self.window.core.config.save()
 
     def destroy(self, id: str):
         """
@@ -248,14 +257,13 @@ class Plugins:
         :return: plugin name
         """
         plugin = self.get(id)
-        default = plugin.name
+        if plugin.use_locale:
+            domain = 'plugin.{}'.format(id)
+            return trans('plugin.name', domain=domain)
         trans_key = 'plugin.' + id
         name = trans(trans_key)
         if name == trans_key:
-            name = default
-        if plugin.use_locale:
-            domain = 'plugin.{}'.format(id)
-            name = trans('plugin.name', domain=domain)
+            name = plugin.name
         return name
 
     def get_desc(self, id: str) -> str:
@@ -266,14 +274,13 @@ class Plugins:
         :return: plugin description
         """
         plugin = self.get(id)
-        default = plugin.description
+        if plugin.use_locale:
+            domain = 'plugin.{}'.format(id)
+            return trans('plugin.description', domain=domain)
         trans_key = 'plugin.' + id + '.description'
         tooltip = trans(trans_key)
         if tooltip == trans_key:
-            tooltip = default
-        if plugin.use_locale:
-            domain = 'plugin.{}'.format(id)
-            tooltip = trans('plugin.description', domain=domain)
+            tooltip = plugin.description
         return tooltip
 
     def dump_locale(self, plugin, path: str):
@@ -9,7 +9,7 @@
 # Updated Date: 2024.11.21 02:00:00                  #
 # ================================================== #
 
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 from pygpt_net.item.ctx import CtxItem
 from pygpt_net.plugin.base.plugin import BasePlugin
@@ -21,6 +21,7 @@ def test_setup(mock_window):
     """Test setup plugins"""
     plugins = Plugins(mock_window)
     plugins.setup_menu = MagicMock()
+    plugins.setup_cache = MagicMock()
     plugins.setup_ui = MagicMock()
     plugins.setup_config = MagicMock()
     plugins.update = MagicMock()
@@ -28,6 +29,7 @@ def test_setup(mock_window):
     plugins.setup()
 
     plugins.setup_menu.assert_called_once()
+    plugins.setup_cache.assert_called_once()
     plugins.setup_ui.assert_called_once()
     plugins.setup_config.assert_called_once()
     plugins.update.assert_called_once()
@@ -45,10 +47,24 @@ def test_setup_ui(mock_window):
 
     plugins.setup_ui()
 
-    plugins.window.core.plugins.get_ids.assert_called_once()
-    plugins.window.core.plugins.get.assert_called_once_with('test')
     plugins.handle_types.assert_called_once()
+    plugin.setup_ui.assert_not_called()  # deferred to first use
+
+
+def test_setup_plugin_ui(mock_window):
+    """Test setup plugin UI on first use"""
+    plugin = BasePlugin()
+    plugin.setup_ui = MagicMock()
+
+    plugins = Plugins(mock_window)
+    plugins.window.core.plugins.get = MagicMock(return_value=plugin)
+
+    plugins.setup_plugin_ui('test')
+    plugins.setup_plugin_ui('test')
+
+    plugins.window.core.plugins.get.assert_called_once_with('test')
     plugin.setup_ui.assert_called_once()
+    assert 'test' in plugins.ui_ready
 
 
 def setup_menu(mock_window):
@@ -63,6 +79,43 @@ def setup_menu(mock_window):
     mock_window.core.plugins.get.assert_called()
 
 
+def test_setup_menu_batch(mock_window):
+    """Test setup plugins menu, new actions added at once"""
+    plugins = Plugins(mock_window)
+    existing = MagicMock()
+    mock_window.ui.menu = {
+        'plugins': {'test': existing},
+        'menu.plugins': MagicMock(),
+    }
+    mock_window.core.plugins.get_ids = MagicMock(return_value=['test', 'test2', 'test3'])
+    mock_window.core.plugins.get_name = MagicMock(return_value='name')
+    mock_window.core.plugins.get_desc = MagicMock(return_value='desc')
+    with patch('pygpt_net.controller.plugins.QAction', side_effect=lambda *args, **kwargs: MagicMock()):
+        plugins.setup_menu()
+    assert mock_window.ui.menu['plugins']['test'] is existing
+    assert mock_window.ui.menu['plugins']['test2'] is not mock_window.ui.menu['plugins']['test3']
+    mock_window.ui.menu['menu.plugins'].addActions.assert_called_once_with([
+        mock_window.ui.menu['plugins']['test2'],
+        mock_window.ui.menu['plugins']['test3'],
+    ])
+    mock_window.ui.menu['menu.plugins'].addAction.assert_not_called()
+
+
+def test_setup_cache(mock_window):
+    """Test setup plugins metadata cache"""
+    plugin = BasePlugin()
+    plugin.name = 'Test'
+    plugin.type = ['audio.input']
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins.get_ids = MagicMock(return_value=['test'])
+    mock_window.core.plugins.get = MagicMock(return_value=plugin)
+    plugins.setup_cache()
+    assert plugins.types == {'test': frozenset(['audio.input'])}
+    assert plugins.names == {'test': 'Test'}
+    assert plugins.audio_ids == {'test'}
+    assert plugins.enabled_by_type == {}
+
+
 def test_setup_config(mock_window):
     """Test setup plugins config"""
     plugins = Plugins(mock_window)
@@ -70,23 +123,59 @@ def test_setup_config(mock_window):
     mock_window.core.plugins.get_ids = MagicMock(return_value=['test'])
     mock_window.core.config.data['plugins_enabled'] = {'test': True}
     plugins.enable = MagicMock()
+    plugins.update_info = MagicMock()
     plugins.setup_config()
     plugins.enable.assert_called_once_with('test')
+    plugins.update_info.assert_called_once()
+    mock_window.core.config.save.assert_not_called()  # nothing changed
+    assert plugins.bulk is False
+
+
+def test_setup_config_save(mock_window):
+    """Test setup plugins config, save once if changed"""
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins = MagicMock()
+    mock_window.core.plugins.get_ids = MagicMock(return_value=['test', 'test2'])
+    mock_window.core.config.data['plugins_enabled'] = {'test': True}
+    plugins.update_info = MagicMock()
+    plugins.setup_config(silent=True)
+    mock_window.core.plugins.enable.assert_called_once_with('test', save=False)
+    mock_window.core.plugins.disable.assert_called_once_with('test2', save=False)
+    mock_window.core.config.save.assert_not_called()
+
+    # new plugin, not stored in config yet
+    def disable(id, save=True):
+        mock_window.core.config.data['plugins_enabled'][id] = False
+    mock_window.core.plugins.disable = MagicMock(side_effect=disable)
+    plugins.setup_config(silent=True)
+    mock_window.core.config.save.assert_called_once()
 
 
 def test_update(mock_window):
     """Test update plugins"""
     plugins = Plugins(mock_window)
-    mock_window.ui.menu['plugins'] = {'test': MagicMock()}
+    mock_window.ui.menu = {'plugins': {'test': MagicMock()}}
     mock_window.controller.ui.mode.update = MagicMock()
     mock_window.controller.ui.vision.update = MagicMock()
-    plugins.enabled = {'test': True}
+    plugins.enabled = {'test'}
     plugins.update()
     mock_window.ui.menu['plugins']['test'].setChecked.assert_called_once_with(True)
     mock_window.controller.ui.mode.update.assert_called_once()
     mock_window.controller.ui.vision.update.assert_called_once()
 
 
+def test_update_unchanged(mock_window):
+    """Test update plugins, skip unchanged menu items"""
+    plugins = Plugins(mock_window)
+    mock_window.ui.menu = {'plugins': {'test': MagicMock(), 'test2': MagicMock()}}
+    mock_window.ui.menu['plugins']['test'].isChecked.return_value = True
+    mock_window.ui.menu['plugins']['test2'].isChecked.return_value = True
+    plugins.enabled = {'test'}
+    plugins.update()
+    mock_window.ui.menu['plugins']['test'].setChecked.assert_not_called()
+    mock_window.ui.menu['plugins']['test2'].setChecked.assert_called_once_with(False)
+
+
 def test_enable(mock_window):
     """Test enable plugin"""
     plugins = Plugins(mock_window)
@@ -94,18 +183,38 @@ def test_enable(mock_window):
     mock_window.core.plugins.enable = MagicMock()
     mock_window.dispatch = MagicMock()
     mock_window.controller.audio.update = MagicMock()
-    plugins.has_type = MagicMock(return_value=True)
+    plugins.audio_ids = {'test'}
     plugins.update_info = MagicMock()
     plugins.update = MagicMock()
     plugins.enable('test')
     mock_window.core.plugins.is_registered.assert_called_once_with('test')
-    mock_window.core.plugins.enable.assert_called_once_with('test')
+    mock_window.core.plugins.enable.assert_called_once_with('test', save=True)
     mock_window.dispatch.assert_called_once()
     mock_window.controller.audio.update.assert_called_once()
     plugins.update_info.assert_called_once()
     plugins.update.assert_called_once()
 
 
+def test_enable_bulk(mock_window):
+    """Test enable plugin in bulk mode"""
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins.is_registered = MagicMock(return_value=True)
+    mock_window.core.plugins.enable = MagicMock()
+    mock_window.dispatch = MagicMock()
+    mock_window.controller.audio.update = MagicMock()
+    plugins.audio_ids = {'test'}
+    plugins.update_info = MagicMock()
+    plugins.update = MagicMock()
+    plugins.bulk = True
+    plugins.enable('test')
+    mock_window.core.plugins.enable.assert_called_once_with('test', save=False)
+    mock_window.dispatch.assert_called_once()
+    mock_window.controller.audio.update.assert_not_called()
+    plugins.update_info.assert_not_called()
+    plugins.update.assert_not_called()
+    assert plugins.bulk_audio is True
+
+
 def test_disable(mock_window):
     """Test disable plugin"""
     plugins = Plugins(mock_window)
@@ -113,33 +222,63 @@ def test_disable(mock_window):
     mock_window.core.plugins.disable = MagicMock()
     mock_window.dispatch = MagicMock()
     mock_window.controller.audio.update = MagicMock()
-    plugins.has_type = MagicMock(return_value=True)
+    plugins.audio_ids = {'test'}
     plugins.update_info = MagicMock()
     plugins.update = MagicMock()
     plugins.disable('test')
     mock_window.core.plugins.is_registered.assert_called_once_with('test')
-    mock_window.core.plugins.disable.assert_called_once_with('test')
+    mock_window.core.plugins.disable.assert_called_once_with('test', save=True)
     mock_window.dispatch.assert_called_once()
     mock_window.controller.audio.update.assert_called_once()
     plugins.update_info.assert_called_once()
     plugins.update.assert_called_once()
 
 
+def test_handle_enable_defer(mock_window):
+    """Test enable plugin with deferred event dispatch"""
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins.enable = MagicMock()
+    mock_window.dispatch = MagicMock()
+    mock_window.controller.audio.update = MagicMock()
+    plugins.audio_ids = {'test'}
+    with patch('pygpt_net.controller.plugins.QTimer') as timer:
+        plugins.handle_enable('test', defer=True)
+    assert plugins.is_enabled('test') is True
+    mock_window.core.plugins.enable.assert_called_once_with('test', save=True)
+    mock_window.dispatch.assert_not_called()
+    timer.singleShot.assert_called_once()
+
+    callback = timer.singleShot.call_args[0][1]
+    callback()
+    mock_window.dispatch.assert_called_once()
+    mock_window.controller.audio.update.assert_called_once()
+
+
+def test_post_enable_disabled(mock_window):
+    """Test deferred enable skipped if plugin disabled again"""
+    plugins = Plugins(mock_window)
+    mock_window.dispatch = MagicMock()
+    plugins.post_enable('test')
+    mock_window.dispatch.assert_not_called()
+
+
 def test_is_enabled(mock_window):
     """Test is enabled plugin"""
     plugins = Plugins(mock_window)
-    mock_window.core.plugins.is_registered = MagicMock(return_value=True)
-    plugins.enabled = {'test': True}
-    plugins.is_enabled('test')
-    mock_window.core.plugins.is_registered.assert_called_once_with('test')
+    plugins.enabled = {'test'}
+    assert plugins.is_enabled('test') is True
+    assert plugins.is_enabled('test2') is False
+    assert plugins.is_enabled('unknown') is False
 
 
 def test_toggle(mock_window):
     """Test toggle plugin"""
     plugins = Plugins(mock_window)
     mock_window.core.plugins.is_registered = MagicMock(return_value=True)
-    plugins.is_enabled = MagicMock(return_value=True)
-    plugins.disable = MagicMock()
+    plugins.enabled = {'test'}
+    plugins.handle_disable = MagicMock()
+    plugins.update_info = MagicMock()
+    plugins.update = MagicMock()
     plugins.handle_types = MagicMock()
     mock_window.controller.ui.update_tokens = MagicMock()
     mock_window.controller.ui.mode.update = MagicMock()
@@ -147,8 +286,9 @@ def test_toggle(mock_window):
     mock_window.controller.attachment.update = MagicMock()
     plugins.toggle('test')
     mock_window.core.plugins.is_registered.assert_called_once_with('test')
-    plugins.is_enabled.assert_called_once_with('test')
-    plugins.disable.assert_called_once_with('test')
+    plugins.handle_disable.assert_called_once_with('test', defer=True)
+    plugins.update_info.assert_called_once()
+    plugins.update.assert_called_once()
     plugins.handle_types.assert_called_once()
     mock_window.controller.ui.update_tokens.assert_called_once()
     mock_window.controller.ui.mode.update.assert_called_once()
@@ -171,22 +311,45 @@ def test_set_by_tab(mock_window):
     mock_window.ui.nodes['plugin.list'].setCurrentIndex.assert_called_once()
 
 
+def test_set_by_tab_out_of_range(mock_window):
+    """Test set current plugin by tab index out of range"""
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins.get_ids = MagicMock(return_value=['test'])
+    mock_window.core.plugins.has_options = MagicMock(return_value=True)
+    mock_window.ui.models['plugin.list'] = MagicMock()
+    mock_window.ui.nodes['plugin.list'] = MagicMock()
+    plugins.settings.current_plugin = 'test'
+    plugins.set_by_tab(1)
+    mock_window.core.plugins.has_options.assert_not_called()
+    assert plugins.settings.current_plugin == 'test'
+
+
 def test_get_tab_idx(mock_window):
     """Test get plugin tab index"""
     plugins = Plugins(mock_window)
-    mock_window.core.plugins.get_ids = MagicMock(return_value=['test'])
-    plugins.get_tab_idx('test')
+    mock_window.core.plugins.get_ids = MagicMock(return_value=['test', 'test2'])
+    assert plugins.get_tab_idx('test') == 0
+    assert plugins.get_tab_idx('test2') == 1
+    assert plugins.get_tab_idx('unknown') is None
     mock_window.core.plugins.get_ids.assert_called_once()
 
 
 def test_unregister(mock_window):
     """Test unregister plugin"""
     plugins = Plugins(mock_window)
-    plugins.enabled = {'test': True}
+    plugins.enabled = {'test'}
+    plugins.types = {'test': frozenset(['test'])}
+    plugins.names = {'test': 'test'}
+    plugins.audio_ids = {'test'}
+    plugins.ui_ready = {'test'}
     mock_window.core.plugins.unregister = MagicMock()
     plugins.unregister('test')
     mock_window.core.plugins.unregister.assert_called_once_with('test')
     assert 'test' not in plugins.enabled
+    assert 'test' not in plugins.types
+    assert 'test' not in plugins.names
+    assert 'test' not in plugins.audio_ids
+    assert 'test' not in plugins.ui_ready
 
 
 def test_destroy(mock_window):
@@ -202,26 +365,38 @@ def test_destroy(mock_window):
 def test_has_type(mock_window):
     """Test has type"""
     plugins = Plugins(mock_window)
-    plugin = BasePlugin()
-    plugin.type = ['test']
-    mock_window.core.plugins.is_registered = MagicMock(return_value=True)
-    mock_window.core.plugins.get = MagicMock(return_value=plugin)
+    plugins.types = {'test_plugin': frozenset(['test'])}
     assert plugins.has_type('test_plugin', 'test') is True
-    mock_window.core.plugins.is_registered.assert_called_once_with('test_plugin')
-    mock_window.core.plugins.get.assert_called_once_with('test_plugin')
+    assert plugins.has_type('test_plugin', 'other') is False
+    assert plugins.has_type('unknown', 'test') is False
 
 
 def test_is_type_enabled(mock_window):
     """Test is type enabled"""
     plugins = Plugins(mock_window)
-    mock_window.core.plugins.get_ids = MagicMock(return_value=['test'])
-    mock_window.core.plugins.get = MagicMock()
-    mock_window.core.plugins.get.return_value.type = ['test']
-    plugins.is_enabled = MagicMock(return_value=True)
+    plugins.enabled_by_type = {'test': 1, 'test2': 0}
     assert plugins.is_type_enabled('test') is True
-    mock_window.core.plugins.get_ids.assert_called_once()
-    mock_window.core.plugins.get.assert_called_once_with('test')
-    plugins.is_enabled.assert_called_once_with('test')
+    assert plugins.is_type_enabled('test2') is False
+    assert plugins.is_type_enabled('other') is False
+
+
+def test_count_types(mock_window):
+    """Test enabled plugins count by type"""
+    plugins = Plugins(mock_window)
+    plugins.types = {
+        'test': frozenset(['vision', 'cmd.inline']),
+        'test2': frozenset(['vision']),
+    }
+    plugins.handle_enable('test')
+    plugins.handle_enable('test')  # already enabled, not counted twice
+    plugins.handle_enable('test2')
+    assert plugins.enabled_by_type == {'vision': 2, 'cmd.inline': 1}
+    plugins.handle_disable('test', silent=True)
+    plugins.handle_disable('test', silent=True)  # already disabled
+    assert plugins.is_type_enabled('vision') is True
+    assert plugins.is_type_enabled('cmd.inline') is False
+    plugins.handle_disable('test2', silent=True)
+    assert plugins.is_type_enabled('vision') is False
 
 
 def test_handle_types(mock_window):
@@ -237,17 +412,68 @@ def test_handle_types(mock_window):
     plugins.is_type_enabled.assert_called_once_with('audio.input')
 
 
+def test_handle_types_handlers(mock_window):
+    """Test handle plugin type, dispatch to type handlers"""
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins.allowed_types = ['audio.input', 'vision', 'schedule']
+    plugins.enabled_by_type = {'audio.input': 1}
+    handler_input = MagicMock()
+    handler_schedule = MagicMock()
+    plugins.type_handlers = {
+        'audio.input': handler_input,
+        'schedule': handler_schedule,
+    }
+    plugins.handle_types()
+    handler_input.assert_called_once_with(True)
+    handler_schedule.assert_called_once_with(False)
+
+
+def test_handle_audio_input(mock_window):
+    """Test handle audio input plugin type"""
+    plugins = Plugins(mock_window)
+    plugins.set_visible = MagicMock()
+    mock_window.dispatch = MagicMock()
+
+    plugins.handle_audio_input(False)
+    mock_window.dispatch.assert_not_called()  # no option check if disabled
+    plugins.set_visible.assert_any_call('audio.input.btn', False)
+    plugins.set_visible.assert_any_call('audio.input', False)
+    mock_window.controller.audio.toggle_input_icon.assert_called_once_with(False)
+
+    plugins.set_visible.reset_mock()
+    plugins.handle_audio_input(True)
+    mock_window.dispatch.assert_called_once()
+    plugins.set_visible.assert_any_call('audio.input.btn', True)  # simple by default
+    plugins.set_visible.assert_any_call('audio.input', False)
+
+
+def test_set_visible(mock_window):
+    """Test set plugin UI addon visibility"""
+    plugins = Plugins(mock_window)
+    mock_window.ui.plugin_addon = {
+        'audio.input': MagicMock(),
+        'audio.input.btn': MagicMock()
+    }
+    mock_window.ui.plugin_addon['audio.input'].testAttribute.return_value = True
+    mock_window.ui.plugin_addon['audio.input'].isHidden.return_value = False
+    mock_window.ui.plugin_addon['audio.input.btn'].testAttribute.return_value = True
+    mock_window.ui.plugin_addon['audio.input.btn'].isHidden.return_value = True
+    plugins.set_visible('audio.input', True)
+    plugins.set_visible('audio.input.btn', True)
+    mock_window.ui.plugin_addon['audio.input'].setVisible.assert_not_called()
+    mock_window.ui.plugin_addon['audio.input.btn'].setVisible.assert_called_once_with(True)
+
+
 def test_update_info(mock_window):
     """Test update plugins info"""
     plugins = Plugins(mock_window)
-    plugin = BasePlugin()
-    plugin.name = 'test'
+    plugins.names = {'test': 'test'}
     mock_window.core.plugins.get_ids = MagicMock(return_value=['test'])
-    mock_window.core.plugins.get = MagicMock(return_value=plugin)
     plugins.is_enabled = MagicMock(return_value=True)
     plugins.window.ui.nodes['chat.plugins'] = MagicMock()
     plugins.update_info()
-    mock_window.core.plugins.get_ids.assert_called()
+    mock_window.core.plugins.get_ids.assert_called_once()
+    plugins.is_enabled.assert_called_once_with('test')
     mock_window.ui.nodes['chat.plugins'].setToolTip.assert_called_once_with('test')
 
 
@@ -285,3 +511,11 @@ def test_apply_cmds_inline(mock_window):
     mock_window.controller.command.dispatch = MagicMock()
     plugins.apply_cmds_inline(ctx, [{'cmd': 'test'}])
     mock_window.controller.command.dispatch.assert_called_once()
+
+
+def test_get_ids(mock_window):
+    """Test get plugins ids"""
+    plugins = Plugins(mock_window)
+    mock_window.core.plugins.get_ids = MagicMock(return_value=('test',))
+    assert plugins.get_ids() == ('test',)
+    mock_window.core.plugins.get_ids.assert_called_once()
@@ -72,4 +72,20 @@ def test_extract_cmd_white_spaces():
     cmd = Command()
     cmd1 = '   ' \
            '{"cmd": "command1", "params": {"arg1": "some arg"}}   '
-    assert cmd.extract_cmd(cmd1) == json.loads(cmd1.strip())
\ No newline at end of file
+    assert cmd.extract_cmd(cmd1) == json.loads(cmd1.strip())
+
+def test_from_commands():
+    """
+    Test unpack commands to execution list
+    """
+    cmd = Command()
+    cmds = [
+        {'cmd': 'command1', 'params': {}},
+        {'params': {}},
+        {'cmd': 'command2'},
+    ]
+    assert cmd.from_commands(cmds) == [
+        {'cmd': 'command1', 'params': {}},
+        {'cmd': 'command2'},
+    ]
+    assert cmd.from_commands([]) == []
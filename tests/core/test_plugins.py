@@ -57,6 +57,25 @@ def test_register(mock_window_conf):
     assert plugins.plugins['test'] == plugin
 
 
+def test_get_ids(mock_window_conf):
+    """
+    Test get ids
+    """
+    plugins = Plugins(mock_window_conf)
+    plugins.window.core.config.get = mock_get
+    plugins.window.core.config.has = mock_has
+    plugin = BasePlugin()
+    plugin.id = 'test'
+    plugins.register(plugin)
+
+    ids = plugins.get_ids()
+    assert ids == ('test',)
+    assert plugins.get_ids() is ids  # cached
+
+    plugins.unregister('test')
+    assert plugins.get_ids() == ()
+
+
 def test_restore_options(mock_window_conf):
     """
     Test restore options